@@ -2,9 +2,9 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import List
 from robot.api.logger import warn
-from confd_gnmi_common import encoding_int_to_str
 
 from gNMIRobotLibrary import gNMIRobotLibrary
+from gnmi_modules import gnmi_common
 
 
 @dataclass
@@ -35,6 +35,7 @@ class CapabilitiesLibrary(gNMIRobotLibrary):
     def get_capabilities_from_device(self) -> None:
         """ Dispatch ``CapabilityRequest`` to a target device and retrieve list of
             supported encodings and model names. """
+        encoding_int_to_str = gnmi_common().encoding_int_to_str
         self.test_teardown()
         try:
             response = self._client.get_capabilities()
@@ -1,11 +1,17 @@
 from __future__ import annotations
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 import json
-from typing import Dict, List, Optional
-from robot.api.logger import trace
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from robot.api.logger import info, trace, warn
+from robot.libraries.BuiltIn import BuiltIn
 from CapabilitiesLibrary import CapabilitiesLibrary
-from confd_gnmi_common import _make_string_path, datatype_str_to_int, \
-    encoding_str_to_int, make_gnmi_path, split_gnmi_path
+from gnmi_config import GNMIConfigTree, apply_notification
+from gnmi_modules import gnmi_common, grpc_module, rpc_error_code
+from perf_report import log_table, percentiles, write_report
 
 
 @dataclass
@@ -43,7 +49,7 @@ class UpdatePayload:
 
     @staticmethod
     def from_obj(updateObj):
-        path = _make_string_path(updateObj.path, xpath=True)
+        path = gnmi_common()._make_string_path(updateObj.path, xpath=True)
         # TODO - bug - fix for proper data types/encodings/values...
         (value_type, dict_data) = str(updateObj.val).split(': ', 1)
         value = json.loads(dict_data)
@@ -61,18 +67,21 @@ class GetLibrary(CapabilitiesLibrary):
         Uses internal state to manage request parameters and response data. """
     ROBOT_LIBRARY_SCOPE = 'SUITE'
 
-    default_encoding: Optional[int]
     default_path: Optional[str]
     params: GetRequestParameters
 
     def __init__(self, lib_config) -> None:
         super().__init__(lib_config)
-        config_encoding = lib_config.default_encoding
-        self.default_encoding = encoding_str_to_int(config_encoding) \
-                                    if config_encoding is not None else None
+        self._default_encoding_name: Optional[str] = lib_config.default_encoding
         self.default_path = lib_config.default_path or None
         self.params = GetRequestParameters()
 
+    @property
+    def default_encoding(self) -> Optional[int]:
+        if self._default_encoding_name is None:
+            return None
+        return gnmi_common().encoding_str_to_int(self._default_encoding_name)
+
     def get_last_updates_count(self):
         """ Return total number of updates in last response payload,
             or 0 if none OK response has been received. """
@@ -103,12 +112,12 @@ class GetLibrary(CapabilitiesLibrary):
 
     def encoding_set_to(self, encoding: str):
         """ Set the `Encoding` parameter of the next `GetRequest` to specified value. """
-        self.params.encoding = encoding_str_to_int(encoding, no_error=True)
+        self.params.encoding = gnmi_common().encoding_str_to_int(encoding, no_error=True)
         trace(f"next GetRequest encoding set to: {self.params.encoding} (input: {encoding})")
 
     def datatype_set_to(self, data_type: str):
         """ Set the `DataType` parameter of the next `GetRequest` to specified value. """
-        self.params.type = datatype_str_to_int(data_type, no_error=True)
+        self.params.type = gnmi_common().datatype_str_to_int(data_type, no_error=True)
         trace(f"next GetRequest datatype set to: {self.params.type} (input: {data_type})")
 
     def paths_include(self, path: str):
@@ -132,6 +141,177 @@ class GetLibrary(CapabilitiesLibrary):
         trace(f"Last exception: {self.last_exception}")
         trace(f"Last response: {self.last_response}")
 
+    def get_list_in_chunks(self, list_path: str, keys: str, chunk_size: int = 100,
+                           keyword: Optional[str] = None) -> int:
+        """ Traverse a (possibly huge) list without retrieving it whole at once.\n
+            First only the list keys are retrieved (``keys`` is a comma separated list
+            of key leaf names), then the list entries are requested in chunks of
+            ``chunk_size`` entries - one ``GetRequest`` per chunk.
+            Each chunk is folded into a configuration tree that is passed to ``keyword``
+            (if specified) and discarded, so the memory use is bounded by the chunk size.\n
+            Only the last chunk's response (or the keys response, if the list is empty)
+            is kept as the last response.
+            Return the number of traversed list entries. """
+        grpc = grpc_module()
+        self.cleanup_last_request_results()
+        key_names = [key.strip() for key in keys.split(',')]
+        list_path = list_path.rstrip('/')
+        chunk_count = 0
+        try:
+            entries = self._get_list_keys(list_path, key_names)
+            trace(f"Retrieved {len(entries)} keys of {list_path}")
+            for config in self._iterate_list_chunks(list_path, key_names, entries, chunk_size):
+                chunk_count += 1
+                if keyword is not None:
+                    BuiltIn().run_keyword(keyword, config)
+                else:
+                    assert config.tree, f"No data received for chunk {chunk_count} of {list_path}"
+        except grpc.RpcError as ex:
+            self.last_exception = ex
+            self.last_response = None
+            trace(f"Last exception: {self.last_exception}")
+            return 0
+        info(f"Traversed {len(entries)} entries of {list_path} in {chunk_count} chunks")
+        return len(entries)
+
+    def _get_list_keys(self, list_path: str, key_names: List[str]) -> List[Tuple[str, ...]]:
+        add_path_prefix = gnmi_common().add_path_prefix
+        list_name = list_path.split('/')[-1].split(':')[-1]
+        kwargs = self.params.to_kwargs(self.default_encoding, None)
+        kwargs['paths'] = [f'{list_path}/{name}' for name in key_names]
+        self.last_response = None
+        response = self._client.get_public(**kwargs)
+        self.last_response = response
+        entries: Dict[Tuple[str, ...], None] = {}
+        for notif in response.notification:
+            for update in notif.update:
+                path = add_path_prefix(update.path, notif.prefix)
+                elem = next((elem for elem in reversed(path.elem)
+                             if elem.name.split(':')[-1] == list_name and elem.key), None)
+                if elem is not None:
+                    entries[self._entry_keys(elem.key, key_names)] = None
+                else:
+                    entries.update(dict.fromkeys(self._keys_from_value(update.val, key_names)))
+        return list(entries)
+
+    @staticmethod
+    def _entry_keys(entry: Dict[str, Any], key_names: List[str]) -> Tuple[str, ...]:
+        """ Key values of a list entry (path element keys or JSON entry) in ``key_names`` order. """
+        missing = [name for name in key_names if name not in entry]
+        assert not missing, f"List entry {dict(entry)} has no key leaves {', '.join(missing)}"
+        return tuple(str(entry[name]) for name in key_names)
+
+    @classmethod
+    def _keys_from_value(cls, value, key_names: List[str]) -> Iterator[Tuple[str, ...]]:
+        """ Extract list keys from a JSON value - either list entries
+            or a single key leaf value of single-key list. """
+        field = value.WhichOneof('value')
+        if field in ('json_val', 'json_ietf_val'):
+            data = json.loads(getattr(value, field))
+        elif field is not None:
+            data = getattr(value, field)
+        else:
+            return
+        if isinstance(data, dict) and len(data) == 1:
+            # list wrapped in its container/name
+            data = next(iter(data.values()))
+        if isinstance(data, list):
+            for entry in data:
+                if isinstance(entry, dict):
+                    yield cls._entry_keys(entry, key_names)
+        elif len(key_names) == 1 and not isinstance(data, dict):
+            yield (str(data),)
+
+    def _iterate_list_chunks(self, list_path: str, key_names: List[str],
+                             entries: List[Tuple[str, ...]], chunk_size: int) \
+            -> Iterator[GNMIConfigTree]:
+        def escape(value: str) -> str:
+            return value.replace('\\', '\\\\').replace(']', '\\]')
+
+        kwargs = self.params.to_kwargs(self.default_encoding, None)
+        for start in range(0, len(entries), chunk_size):
+            kwargs['paths'] = [list_path + ''.join(f'[{name}={escape(value)}]'
+                                                   for name, value in zip(key_names, keyvals))
+                               for keyvals in entries[start:start + chunk_size]]
+            self.last_response = None
+            response = self._client.get_public(**kwargs)
+            config = GNMIConfigTree()
+            for notif in response.notification:
+                apply_notification(config, notif)
+            self.last_response = response
+            yield config
+
+    def run_get_load(self, paths: List[str], max_workers: int, step_duration: float,
+                     start_workers: int = 1, workers_step: int = 1,
+                     report_file: Optional[str] = None, knee_factor: float = 2.0,
+                     error_threshold: float = 0.01) -> List[Dict[str, Any]]:
+        """ Drive closed-loop ``GetRequest`` load and find the load the device sustains.\n
+            Concurrent workers (each sending the next request as soon as the previous
+            one is answered) cycle through the ``paths``. Their number is ramped up from
+            ``start_workers`` to ``max_workers`` by ``workers_step``, each step lasting
+            ``step_duration`` seconds. For each step throughput, latency percentiles
+            and gRPC status codes are recorded. The first step where p99 latency exceeds
+            ``knee_factor`` times the first step's p99, or the error ratio exceeds
+            ``error_threshold``, is marked as the knee.\n
+            Results are logged, and written to ``report_file`` (JSON, or CSV by extension)
+            in the output directory if specified. """
+        paths = list(paths)
+        steps = []
+        knee = None
+        for workers in range(start_workers, max_workers + 1, workers_step):
+            step = self._run_get_load_step(paths, workers, step_duration)
+            if knee is None and steps \
+                    and (step['p99'] > knee_factor * steps[0]['p99']
+                         or step['errors'] > error_threshold * step['requests']):
+                knee = workers
+            step['knee'] = knee == workers
+            steps.append(step)
+        log_table('Get load', ('workers', 'requests', 'req/s', 'p50 ms', 'p90 ms', 'p99 ms',
+                               'errors', 'knee'),
+                  [(s['workers'], s['requests'], f"{s['throughput']:.1f}", f"{s['p50']:.1f}",
+                    f"{s['p90']:.1f}", f"{s['p99']:.1f}", s['errors'], '*' if s['knee'] else '')
+                   for s in steps])
+        if knee is not None:
+            warn(f'Get latency/errors degraded at {knee} concurrent workers')
+        if report_file is not None:
+            output_dir = BuiltIn().get_variable_value('${OUTPUT DIR}', '.')
+            write_report(os.path.join(output_dir, report_file), steps)
+        return steps
+
+    def _run_get_load_step(self, paths: List[str], workers: int, duration: float) \
+            -> Dict[str, Any]:
+        grpc = grpc_module()
+        kwargs = self.params.to_kwargs(self.default_encoding, None)
+        deadline = time.monotonic() + duration
+
+        def worker(index: int) -> Tuple[List[float], Counter]:
+            latencies: List[float] = []
+            codes: Counter = Counter()
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    self._client.get_public(**dict(kwargs, paths=[paths[index % len(paths)]]))
+                    code = 'OK'
+                except grpc.RpcError as err:
+                    code = rpc_error_code(err)
+                latencies.append(time.perf_counter() - start)
+                codes[code] += 1
+                index += 1
+            return latencies, codes
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(worker, range(workers)))
+        elapsed = time.monotonic() - start
+        latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+        codes = sum((worker_codes for _, worker_codes in results), Counter())
+        step = {'workers': workers, 'requests': len(latencies),
+                'throughput': len(latencies) / elapsed,
+                'errors': len(latencies) - codes['OK'], 'codes': dict(codes)}
+        stats = percentiles(latencies, (50, 90, 99))
+        step.update({name: stats.get(name, 0.0) * 1000 for name in ('p50', 'p90', 'p99', 'max')})
+        return step
+
     def get_last_flattened_updates(self) -> List[List[UpdatePayload]]:
         if self.last_response is None:
             return None
@@ -195,12 +375,12 @@ class GetLibrary(CapabilitiesLibrary):
     @staticmethod
     def count_prefix_path_steps(full_path: str):
         """ Return number of nodes (separated with \'/\') on the specified path string. """
-        elem_path = make_gnmi_path(full_path)
+        elem_path = gnmi_common().make_gnmi_path(full_path)
         return len(elem_path.elem) - 1
 
     @staticmethod
     def split_prefix_path(xpath_path: str, step: int):
         """ Split the input path at specified index/slash position,
             and return the two parts - leading \"prefix\" and the rest, \"path\". """
-        (prefix, path) = split_gnmi_path(xpath_path, step)
+        (prefix, path) = gnmi_common().split_gnmi_path(xpath_path, step)
         return (prefix, path)
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+import time
+import typing as t
+
+from robot.api.logger import trace
+
+from SubscribeLibrary import DRAIN_BATCH_SIZE, SubscribeLibrary
+from gnmi_config import GNMIConfigTree, GNMIConfigValue, apply_response, lookup_config
+from gnmi_modules import gnmi_common, gnmi_pb2
+from perf_report import log_table, percentiles
+
+
+def leaf_string(leaf: t.Any) -> t.Optional[str]:
+    '''String value of a configuration tree leaf, or None if it is not
+    a string leaf.  JSON encoded values (bytes) are decoded.'''
+    if not isinstance(leaf, GNMIConfigValue):
+        return None
+    value = leaf.value
+    if isinstance(value, bytes):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    return value if isinstance(value, str) else None
+
+
+class SetLibrary(SubscribeLibrary):
+    "ROBOT test suite library for servicing the gNMI SetRequest tests."
+    ROBOT_LIBRARY_SCOPE = 'SUITE'
+
+    def set_leaf(self, path: str, value: t.Any) -> None:
+        '''Dispatch SetRequest updating a single leaf to a JSON_IETF encoded value.'''
+        make_gnmi_path = gnmi_common().make_gnmi_path
+        typed_value = gnmi_pb2().TypedValue(json_ietf_val=json.dumps(value).encode())
+        self._client.set(make_gnmi_path(''), [(make_gnmi_path(path), typed_value)])
+
+    def measure_on_change_latency(self, leaf_path: str, encoding: str, count: int,
+                                  timeout: int, burst: int = 1) -> t.Dict[str, t.Any]:
+        '''Measure how fast leaf changes made by SetRequest show up
+        on an ON_CHANGE stream of current subscription paths with given encoding.
+
+        `count` distinct values are set to `leaf_path` (which needs to
+        be under one of the subscription paths), one at a time or in
+        bursts of `burst` requests.  Each change is correlated with the
+        first update that makes the leaf have the value in the
+        configuration tree built from the stream.  Changes superseded
+        by a later change of the same burst before being notified are
+        reported as coalesced, changes of a burst not notified within
+        `timeout` seconds after the burst as lost.  The leaf needs to
+        exist and hold a string value, the value is restored afterwards.
+        '''
+        self.subscribe('STREAM', encoding, 'ON_CHANGE')
+        config = self.get_initial_subscribe_config(timeout)
+        elems = gnmi_common().make_gnmi_path(leaf_path).elem
+        original = leaf_string(lookup_config(config, elems))
+        if original is None:
+            self.close_subscription()
+            raise AssertionError(f'{leaf_path} is not an existing string leaf '
+                                 f'in the initial updates, refusing to change it')
+        run_id = f'gnmi-tests-{time.time_ns()}'
+        values = [f'{run_id}-{index}' for index in range(count)]
+        latencies: t.List[float] = []
+        lost = coalesced = 0
+        try:
+            for start in range(0, count, burst):
+                pending: t.Dict[str, float] = {}
+                for value in values[start:start + burst]:
+                    pending[value] = time.perf_counter()
+                    self.set_leaf(leaf_path, value)
+                notified, superseded = self._await_leaf_values(config, elems, pending, timeout)
+                latencies += notified
+                coalesced += superseded
+                lost += len(pending)
+        finally:
+            self.set_leaf(leaf_path, original)
+            self.close_subscription()
+        result = {'count': count, 'burst': burst, 'lost': lost, 'coalesced': coalesced,
+                  **{name: value * 1000 for name, value in percentiles(latencies).items()}}
+        log_table('Set to ON_CHANGE notification latency',
+                  list(result), [[f'{v:.1f}' if isinstance(v, float) else v
+                                  for v in result.values()]])
+        return result
+
+    def _await_leaf_values(self, config: GNMIConfigTree, elems: t.Sequence[t.Any],
+                           pending: t.Dict[str, float], timeout: int) \
+            -> t.Tuple[t.List[float], int]:
+        '''Consume stream responses until all pending values are resolved,
+        at most `timeout` seconds in total.
+
+        Resolved values are removed from `pending`, the remaining ones
+        were not notified within the timeout.  Return latencies of
+        notified values and number of coalesced values.
+        '''
+        latencies = []
+        coalesced = 0
+        deadline = time.monotonic() + timeout
+        while pending and (batch := self.requester.drain(DRAIN_BATCH_SIZE, deadline)):
+            received = time.perf_counter()
+            # the whole batch is applied, to keep the tree up to date
+            for response in batch:
+                apply_response(config, response)
+                if (value := leaf_string(lookup_config(config, elems))) not in pending:
+                    continue
+                # values set before the notified one can't be notified anymore
+                for pending_value in list(pending):
+                    set_time = pending.pop(pending_value)
+                    if pending_value == value:
+                        latencies.append(received - set_time)
+                        break
+                    coalesced += 1
+        if pending:
+            trace(f'Changes not notified within {timeout} seconds: {list(pending)}')
+        return latencies, coalesced
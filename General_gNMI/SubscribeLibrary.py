@@ -1,26 +1,33 @@
 from __future__ import annotations
 
-import _queue
 import json
 import typing as t
 import threading
 import queue
-from datetime import datetime as dt
+import time
+from collections import OrderedDict, deque
+
+from robot.api.logger import info, trace
+from robot.utils import DotDict
 
-import gnmi_pb2
-from confd_gnmi_common import make_gnmi_path, encoding_str_to_int, \
-    subscription_mode_str_to_int, stream_mode_str_to_int
-from confd_gnmi_client import ConfDgNMIClient
 from CapabilitiesLibrary import CapabilitiesLibrary
-from gnmi_config import GNMIConfigTree, apply_response, UpdateType
+from device_limiter import SlotLock
+from gnmi_config import GNMIConfigTree, apply_notification, apply_response, UpdateType
+from gnmi_modules import gnmi_client_class, gnmi_common, gnmi_pb2, grpc_module, rpc_error_code
+from perf_report import compressed_size, log_table, percentiles
+from sample_store import SampleStore
 
-import grpc
-import gnmi_pb2 as gnmi
+if t.TYPE_CHECKING:
+    from confd_gnmi_client import ConfDgNMIClient
+    import gnmi_pb2 as gnmi
 
-SlistType = t.Optional[t.Union[gnmi.Poll, gnmi.SubscriptionList]]
+    SlistType = t.Optional[t.Union[gnmi.Poll, gnmi.SubscriptionList]]
 
 
 NO_SYNC_RESPONSE = 'The server did not send sync_response'
+MAX_REPORTED_LEAVES = 10
+CLOSE_TIMEOUT = 10  # safety limit only, closing a cancelled subscription is immediate
+DRAIN_BATCH_SIZE = 100
 
 
 class Requester(threading.Thread):
@@ -28,14 +35,18 @@ class Requester(threading.Thread):
         super().__init__()
         self.client: ConfDgNMIClient = client
         self._slist_queue: queue.Queue[SlistType] = queue.Queue()
-        self._response_queue: queue.Queue[gnmi.SubscribeResponse] = queue.Queue()
+        # received responses, None marks the end of the stream
+        self._buffer: t.Deque[t.Optional[gnmi.SubscribeResponse]] = deque()
+        self._buffer_ready = threading.Condition()
+        self.ended = False
         self._responses = self.client.subscribe(self.requests())
         self._runner_error: t.Optional[Exception] = None
 
     def run(self) -> None:
+        grpc = grpc_module()
         try:
             for response in self._responses:
-                self._response_queue.put(response)
+                self._push(response)
         except grpc.RpcError as err:
             if isinstance(err, grpc.Call) and err.code() == grpc.StatusCode.CANCELLED:
                 # cancelled locally
@@ -47,9 +58,15 @@ class Requester(threading.Thread):
                 # let the main thread know
                 self._runner_error = err
         finally:
-            self._response_queue.put(None)
+            self._push(None)
+
+    def _push(self, response: t.Optional[gnmi.SubscribeResponse]) -> None:
+        with self._buffer_ready:
+            self._buffer.append(response)
+            self._buffer_ready.notify()
 
     def requests(self) -> t.Iterator[gnmi.SubscribeRequest]:
+        gnmi = gnmi_pb2()
         while (slitem := self._slist_queue.get()) is not None:
             if isinstance(slitem, gnmi.SubscriptionList):
                 yield gnmi.SubscribeRequest(subscribe=slitem)
@@ -57,20 +74,70 @@ class Requester(threading.Thread):
                 yield gnmi.SubscribeRequest(poll=slitem)
         self._responses.cancel()
 
+    def cancel(self) -> None:
+        '''Cancel the subscription RPC right away and end the request stream.'''
+        self._responses.cancel()
+        self._slist_queue.put(None)
+
     def enqueue(self, item: SlistType) -> None:
         self._slist_queue.put(item)
 
     def raw_responses(self, timeout: int) -> t.Iterator[gnmi.SubscribeResponse]:
-        if not self.is_alive():
-            # yield only queued updates
-            for _ in range(self._response_queue.qsize()):
-                if (response := self._response_queue.get()) is None:
-                    return
-                yield response
-        else:
-            while (response := self._response_queue.get(timeout=timeout)) is not None:
-                yield response
-            self.join()
+        '''Yield responses until the end of the stream, waiting at most
+        `timeout` seconds for each of them; raise `queue.Empty` on timeout.'''
+        while (response := self._next_response(timeout)) is not None:
+            yield response
+        self.join()
+        self._check_runner_error()
+
+    def _next_response(self, timeout: float) -> t.Optional[gnmi.SubscribeResponse]:
+        with self._buffer_ready:
+            if not self._buffer_ready.wait_for(lambda: self._buffer or self.ended, timeout):
+                raise queue.Empty
+            return self._pop()
+
+    def _pop(self) -> t.Optional[gnmi.SubscribeResponse]:
+        # to be called with the condition held and a nonempty buffer or ended stream
+        if not self._buffer:
+            return None
+        if (response := self._buffer.popleft()) is None:
+            self.ended = True
+        return response
+
+    def drain(self, max_count: int, deadline: float) -> t.List[gnmi.SubscribeResponse]:
+        '''Return up to `max_count` received responses, waiting until at
+        least one is available or until the `deadline` (in terms of
+        `time.monotonic()`) passes.
+
+        An empty list is returned if the deadline has passed, or if the
+        stream has ended (`ended` is set then).
+        '''
+        batch: t.List[gnmi.SubscribeResponse] = []
+        with self._buffer_ready:
+            self._buffer_ready.wait_for(lambda: self._buffer or self.ended,
+                                        deadline - time.monotonic())
+            while self._buffer and len(batch) < max_count:
+                if (response := self._pop()) is None:
+                    break
+                batch.append(response)
+        if self.ended:
+            self._check_runner_error()
+        return batch
+
+    def push_back(self, responses: t.Sequence[gnmi.SubscribeResponse]) -> None:
+        '''Return responses taken by `drain` but not consumed to the front
+        of the buffer, in the same order, to be read by the next call.'''
+        if responses:
+            with self._buffer_ready:
+                self._buffer.extendleft(reversed(responses))
+                self._buffer_ready.notify()
+
+    @property
+    def runner_error(self) -> t.Optional[Exception]:
+        '''Error the subscription RPC failed with, if any.'''
+        return self._runner_error
+
+    def _check_runner_error(self) -> None:
         assert self._runner_error is None, 'server failed with ' + str(self._runner_error)
 
     def responses(self, timeout: int, msg: t.Optional[str] = None) \
@@ -83,6 +150,48 @@ class Requester(threading.Thread):
             raise AssertionError(msg) from e
 
 
+SnapshotKey = t.Tuple[t.Tuple[str, ...], str, str]
+
+
+class SnapshotCache:
+    '''Size-bounded LRU cache of initial subscription snapshots,
+    keyed by subscription paths, mode and encoding.
+
+    Also a Robot listener reporting the cache statistics at the end of
+    the suite, if the cache is enabled.'''
+    ROBOT_LISTENER_API_VERSION = 2
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._snapshots: OrderedDict[SnapshotKey, GNMIConfigTree] = OrderedDict()
+
+    def get(self, key: SnapshotKey) -> t.Optional[GNMIConfigTree]:
+        if (config := self._snapshots.get(key)) is None:
+            self.misses += 1
+            return None
+        self._snapshots.move_to_end(key)
+        self.hits += 1
+        return config
+
+    def put(self, key: SnapshotKey, config: GNMIConfigTree) -> None:
+        if self.size <= 0:
+            return
+        self._snapshots[key] = config
+        self._snapshots.move_to_end(key)
+        while len(self._snapshots) > self.size:
+            self._snapshots.popitem(last=False)
+
+    def clear(self) -> None:
+        self._snapshots.clear()
+
+    def end_suite(self, name: str, attrs: t.Dict[str, t.Any]) -> None:
+        if self.size > 0:
+            info(f'Snapshot cache of suite {name}: {self.hits} hits, {self.misses} misses',
+                 also_console=True)
+
+
 class SubscribeLibrary(CapabilitiesLibrary):
     "ROBOT test suite library for servicing the gNMI SubscribeRequest tests."
     ROBOT_LIBRARY_SCOPE = 'SUITE'
@@ -91,6 +200,12 @@ class SubscribeLibrary(CapabilitiesLibrary):
         super().__init__(lib_config)
         self.paths: t.Tuple[str, ...] = ()
         self.requester: t.Optional[Requester] = None
+        self._stream_slot: t.Optional[SlotLock] = None
+        self.snapshot_cache = SnapshotCache(int(lib_config.get('snapshot_cache_size') or 0))
+        self.ROBOT_LIBRARY_LISTENER = [self._profiler, self.snapshot_cache]
+        self._sample_store_configured = bool(lib_config.get('sample_store'))
+        self.samples: t.Optional[SampleStore] = \
+            SampleStore() if self._sample_store_configured else None
 
     def close_client(self) -> None:
         self.paths = ()
@@ -98,19 +213,29 @@ class SubscribeLibrary(CapabilitiesLibrary):
         super().close_client()
 
     def close_subscription(self) -> None:
-        if self.requester is not None:
-            self.requester.enqueue(None)
-            self.requester.join(2)
-        self.requester = None
+        requester, self.requester = self.requester, None
+        try:
+            if requester is not None:
+                # cancelling makes the response thread finish without waiting
+                # for the request stream to be processed
+                requester.cancel()
+                requester.join(CLOSE_TIMEOUT)
+                assert not requester.is_alive(), 'Subscription thread did not finish'
+        finally:
+            if self._stream_slot is not None:
+                self._stream_slot.release()
+                self._stream_slot = None
 
     def subscribe(self, mode: str, encoding: str, stream_mode: t.Optional[str] = None,
                   sample_period: t.Optional[str] = None) -> None:
-        paths = [make_gnmi_path(path) for path in self.paths]
-        iencoding = encoding_str_to_int(encoding)
-        prefix = make_gnmi_path('')
-        imode = subscription_mode_str_to_int(mode)
+        ConfDgNMIClient = gnmi_client_class()
+        common = gnmi_common()
+        paths = [common.make_gnmi_path(path) for path in self.paths]
+        iencoding = common.encoding_str_to_int(encoding)
+        prefix = common.make_gnmi_path('')
+        imode = common.subscription_mode_str_to_int(mode)
         if mode == 'STREAM' and stream_mode is not None:
-            istr_mode = stream_mode_str_to_int(stream_mode)
+            istr_mode = common.stream_mode_str_to_int(stream_mode)
             iperiod_ms = None
             if sample_period is not None:
                 iperiod_ms = int(sample_period)*1000
@@ -118,6 +243,11 @@ class SubscribeLibrary(CapabilitiesLibrary):
                                                            iencoding, istr_mode, iperiod_ms)
         else:
             slist = ConfDgNMIClient.make_subscription_list(prefix, paths, imode, iencoding)
+        assert self.requester is None, 'A subscription is already open, close it first'
+        if self.samples is not None:
+            self.samples.clear()
+        if self._stream_slot is None and self._stream_slots is not None:
+            self._stream_slot = self._stream_slots.acquire()
         self.requester = Requester(self._client)
         self.requester.start()
         self.requester.enqueue(slist)
@@ -166,7 +296,31 @@ class SubscribeLibrary(CapabilitiesLibrary):
     def get_initial_subscribe_config(self, timeout: int) -> GNMIConfigTree:
         config = GNMIConfigTree()
         for response in self._iterate_initial_responses(timeout):
-            apply_response(config, response, UpdateType.STRUCTURE)
+            apply_response(config, response, UpdateType.STRUCTURE, self.samples)
+        return config
+
+    def initial_snapshot(self, mode: str, encoding: str, timeout: int) -> GNMIConfigTree:
+        '''Return the configuration tree built from initial responses of
+        a subscription to current subscription paths.
+
+        If the snapshot cache is enabled (``snapshot_cache_size`` in
+        ``lib_config``), a snapshot received by an earlier call is reused
+        instead of subscribing again.  The returned tree is shared, it
+        must not be modified.  Meant for structural checks of custom test
+        suites (the shipped tests verify the synchronization itself or
+        need their own stream), not to be used by tests verifying the
+        synchronization.
+        '''
+        key = (tuple(self.paths), mode, encoding)
+        if (config := self.snapshot_cache.get(key)) is not None:
+            trace('Initial snapshot reused from cache')
+            return config
+        self.subscribe(mode, encoding)
+        try:
+            config = self.get_initial_subscribe_config(timeout)
+        finally:
+            self.close_subscription()
+        self.snapshot_cache.put(key, config)
         return config
 
     def check_on_change_updates(self, timeout: int, update_time: int) -> None:
@@ -174,18 +328,71 @@ class SubscribeLibrary(CapabilitiesLibrary):
         self._wait_on_change_updates(config, timeout, update_time)
 
     def _wait_on_change_updates(self, config: GNMIConfigTree, timeout: int, update_time) -> None:
-        responses = False
+        '''Apply updates received within `update_time` seconds; fail if
+        there are none, or if the server is silent for more than
+        `timeout` seconds before the time is up.'''
+        updated = False
         NO_UPDATES = 'No updates were received'
-        now = dt.now()
+        end = time.monotonic() + update_time
         try:
-            for response in self.requester.raw_responses(timeout):
-                responses = apply_response(config, response, UpdateType.VALUE)
-                if (dt.now() - now).seconds >= update_time:
+            while (now := time.monotonic()) < end:
+                batch = self.requester.drain(DRAIN_BATCH_SIZE, min(end, now + timeout))
+                if not batch:
+                    if not self.requester.ended and time.monotonic() < end:
+                        raise AssertionError(NO_UPDATES)
                     break
-        except queue.Empty:
-            if (dt.now() - now).seconds < update_time:
-                raise AssertionError(NO_UPDATES)
-        assert responses, NO_UPDATES
+                for response in batch:
+                    updated |= apply_response(config, response, UpdateType.VALUE, self.samples)
+        finally:
+            trace(f'Configuration tree: {config.node_count()} live nodes, '
+                  f'{config.deleted_nodes} deleted nodes')
+        assert updated, NO_UPDATES
+
+    def enable_sample_store(self) -> None:
+        '''Record history of numeric leaf values received by following
+        subscriptions, to be verified by the counter checks.'''
+        if self.samples is None:
+            self.samples = SampleStore()
+
+    def disable_sample_store(self) -> None:
+        '''Stop recording enabled by `Enable Sample Store` and drop the
+        recorded history.  Recording enabled by ``sample_store`` in
+        ``lib_config`` stays on.'''
+        if not self._sample_store_configured:
+            self.samples = None
+
+    def _sample_series(self, pattern: str) -> t.List[t.Tuple[str, t.Any]]:
+        assert self.samples is not None, 'Sample store is not enabled'
+        series = list(self.samples.matching(pattern))
+        assert series, f'No numeric leaf values recorded for paths matching {pattern}'
+        return series
+
+    def counters_should_be_monotonic(self, pattern: str = '*') -> None:
+        '''Verify that recorded values of leaves matching the glob pattern never decrease.'''
+        failed = [path for path, series in self._sample_series(pattern) if series.decreases()]
+        self._assert_leaves('Counters decreased', failed)
+
+    def rates_should_be_within_bounds(self, minimum: float, maximum: float,
+                                      pattern: str = '*') -> None:
+        '''Verify that per-second change rates between consecutive samples
+        of leaves matching the glob pattern are within given bounds.'''
+        failed = [path for path, series in self._sample_series(pattern)
+                  if any(rate < minimum or rate > maximum for rate in series.rates())]
+        self._assert_leaves(f'Rates out of <{minimum}, {maximum}>', failed)
+
+    def leaves_should_not_be_stale(self, count: int, pattern: str = '*') -> None:
+        '''Verify that none of leaves matching the glob pattern kept the
+        same value over the last `count` samples.'''
+        failed = [path for path, series in self._sample_series(pattern) if series.stale(count)]
+        self._assert_leaves(f'Values unchanged over {count} samples', failed)
+
+    @staticmethod
+    def _assert_leaves(message: str, paths: t.List[str]) -> None:
+        if paths:
+            elems = ', '.join(paths[:MAX_REPORTED_LEAVES])
+            if len(paths) > MAX_REPORTED_LEAVES:
+                elems += f', ... (in total {len(paths)} leaves)'
+            raise AssertionError(f'{message}: {elems}')
 
     def check_sample_updates(self, period: int, count: int, timeout: int) -> None:
         '''Check that `count` samples are received in intervals
@@ -193,32 +400,234 @@ class SubscribeLibrary(CapabilitiesLibrary):
         the same tree as the initial sample.
         '''
         initial_tree = self.get_initial_subscribe_config(timeout)
-        for index in range(count):
-            sample_tree = GNMIConfigTree()
-            sample_msg = f'Sample {index+1} not received within {period} seconds'
-            cover_msg = f'Sample {index+1} does not cover the full tree'
-            response = next(self.requester.responses(period + timeout, sample_msg))
-            apply_response(sample_tree, response, UpdateType.STRUCTURE)
-            next_responses = self.requester.responses(timeout, cover_msg)
-            while not initial_tree.covered_by(sample_tree):
-                response = next(next_responses)
-                apply_response(sample_tree, response, UpdateType.STRUCTURE)
+        pending: t.Deque[gnmi.SubscribeResponse] = deque()
+
+        def next_response(deadline: float, msg: str) -> gnmi.SubscribeResponse:
+            if not pending:
+                pending.extend(self.requester.drain(DRAIN_BATCH_SIZE, deadline))
+                if not pending:
+                    raise AssertionError(msg)
+            return pending.popleft()
+
+        try:
+            for index in range(count):
+                sample_tree = GNMIConfigTree()
+                sample_msg = f'Sample {index+1} not received within {period} seconds'
+                cover_msg = f'Sample {index+1} does not cover the full tree'
+                response = next_response(time.monotonic() + period + timeout, sample_msg)
+                # the whole sample needs to arrive within the timeout
+                sample_end = time.monotonic() + timeout
+                apply_response(sample_tree, response, UpdateType.STRUCTURE, self.samples)
+                while not initial_tree.covered_by(sample_tree):
+                    response = next_response(sample_end, cover_msg)
+                    apply_response(sample_tree, response, UpdateType.STRUCTURE, self.samples)
+        finally:
+            # responses after the last sample are left for following checks
+            self.requester.push_back(list(pending))
 
     def check_updates_not_aggregated(self, timeout: int, encoding: str) -> None:
+        gnmi = gnmi_pb2()
+        end = time.monotonic() + timeout
+        while batch := self.requester.drain(DRAIN_BATCH_SIZE, end):
+            for index, response in enumerate(batch):
+                if response.sync_response:
+                    # responses after the sync are left for following checks
+                    self.requester.push_back(batch[index + 1:])
+                    return
+                if encoding == gnmi.Encoding.JSON_IETF:
+                    count = 0
+                    for count, u in enumerate(response.update.update,
+                                              start=1):
+                        val = json.loads(u.val.json_ietf_val)
+                        if isinstance(val, list):
+                            assert not any(isinstance(x, dict) for x in val)
+                        else:
+                            assert not isinstance(val, dict)
+                    assert (count > 1)
+
+    def benchmark_channel_compression(self, device_config: DotDict, path: str, encoding: str,
+                                      timeout: int, repeat: int = 3,
+                                      compressions: t.Sequence[str] = ('none', 'gzip', 'deflate')) \
+            -> t.List[t.Dict[str, t.Any]]:
+        '''Run the same Get and ONCE subscription of `path` with each
+        channel compression setting and report the end-to-end time.
+
+        The channel compression applies only to messages sent by the
+        client (the requests); whether the responses are compressed is up
+        to the server.  Only the time is therefore compared between the
+        settings.  Besides the response bytes, each row reports
+        compressibility of the response payload - the size after
+        compressing the received messages locally with the row's
+        algorithm.  That is an offline estimate independent of the
+        channel setting, not a measurement of bytes on the wire.
+
+        Each setting uses its own client connection, the current client
+        is restored afterwards.  The extra connection occupies its own
+        session slot, so with ``max_sessions`` set the limit needs to
+        allow one more session than the test's own.
+        '''
+        original_client, original_slot = self._client, self._session_slot
+        original_paths = self.paths
+        iencoding = gnmi_common().encoding_str_to_int(encoding)
+        results = []
         try:
-            for response in self.requester.raw_responses(timeout):
-                if not response.sync_response:
-                    if encoding == gnmi_pb2.Encoding.JSON_IETF:
-                        count = 0
-                        for count, u in enumerate(response.update.update,
-                                                  start=1):
-                            val = json.loads(u.val.json_ietf_val)
-                            if isinstance(val, list):
-                                assert not any(isinstance(x, dict) for x in val)
-                            else:
-                                assert not isinstance(val, dict)
-                        assert (count > 1)
-                else:
-                    break
-        except _queue.Empty:
-            pass
+            for compression in compressions:
+                # setup_client assigns the client only if it succeeds, and acquires
+                # a session slot only if none is held
+                self._client, self._session_slot = None, None
+                self.setup_client(DotDict(device_config, compression=compression))
+                client = self._client
+                try:
+                    results.append(self._benchmark_get(compression, path, iencoding, repeat))
+                    results.append(self._benchmark_once(compression, path, encoding,
+                                                        timeout, repeat))
+                finally:
+                    self.close_subscription()
+                    try:
+                        client.close()
+                    finally:
+                        self._release_session_slot()
+        finally:
+            self._client, self._session_slot = original_client, original_slot
+            self.paths = original_paths
+        log_table('Channel compression benchmark - time per channel setting (requests are '
+                  'compressed), response payload compressibility estimated offline',
+                  ('channel compression', 'operation', 'mean ms', 'response bytes',
+                   'payload compressed offline'),
+                  [(r['compression'], r['operation'], f"{r['mean_ms']:.1f}", r['bytes'],
+                    r['offline_compressed_bytes']) for r in results])
+        return results
+
+    def _benchmark_get(self, compression: str, path: str, iencoding: int, repeat: int) \
+            -> t.Dict[str, t.Any]:
+        elapsed = 0.0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = self._client.get_public(prefix=None, paths=[path], get_type=0,
+                                               encoding=iencoding)
+            elapsed += time.perf_counter() - start
+        data = response.SerializeToString()
+        return {'compression': compression, 'operation': 'Get', 'bytes': len(data),
+                'offline_compressed_bytes': compressed_size(data, compression),
+                'mean_ms': elapsed * 1000 / repeat}
+
+    def _benchmark_once(self, compression: str, path: str, encoding: str, timeout: int,
+                        repeat: int) -> t.Dict[str, t.Any]:
+        elapsed = 0.0
+        self.subscription_paths(path)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            self.subscribe('ONCE', encoding)
+            responses = list(self._iterate_initial_responses(timeout))
+            elapsed += time.perf_counter() - start
+            self.close_subscription()
+        blobs = [response.SerializeToString() for response in responses]
+        size = sum(len(data) for data in blobs)
+        compressed = sum(compressed_size(data, compression) for data in blobs)
+        return {'compression': compression, 'operation': 'Subscribe ONCE', 'bytes': size,
+                'offline_compressed_bytes': compressed, 'mean_ms': elapsed * 1000 / repeat}
+
+    def benchmark_supported_encodings(self, path: str, timeout: int) -> t.List[t.Dict[str, t.Any]]:
+        '''Run the same ONCE subscription and the same Get of `path` for
+        each encoding advertised by the device and report time (to sync
+        for ONCE), payload bytes, notification and update counts and
+        the client decode time (building the configuration tree).
+
+        Encodings rejected by the device (or ONCE subscriptions not synced
+        within `timeout`) are reported with the error code instead of the
+        measurements.  Capabilities need to be retrieved
+        first.
+        '''
+        results = []
+        original_paths = self.paths
+        self.subscription_paths(path)
+        try:
+            for encoding in self.last_supported_encodings():
+                results.append(self._measure_once_encoding(encoding, timeout))
+                results.append(self._measure_get_encoding(path, encoding))
+        finally:
+            self.paths = original_paths
+        log_table('Encoding comparison',
+                  ('encoding', 'operation', 'ms', 'bytes', 'notifications', 'updates',
+                   'decode ms'),
+                  [(r['encoding'], r['operation'], f"error: {r['error']}", '-', '-', '-', '-')
+                   if 'error' in r else
+                   (r['encoding'], r['operation'], f"{r['ms']:.1f}", r['bytes'],
+                    r['notifications'], r['updates'], f"{r['decode_ms']:.1f}")
+                   for r in results])
+        return results
+
+    def _measure_once_encoding(self, encoding: str, timeout: int) -> t.Dict[str, t.Any]:
+        start = time.perf_counter()
+        self.subscribe('ONCE', encoding)
+        requester = self.requester
+        try:
+            # the iteration ends with the sync response
+            responses = list(self._iterate_initial_responses(timeout))
+            elapsed = time.perf_counter() - start
+        except AssertionError as err:
+            # rejected by the server, or no sync response within the timeout
+            error = requester.runner_error
+            code = 'TIMEOUT' if error is None else rpc_error_code(error)
+            trace(f'Subscribe ONCE with encoding {encoding} failed: {err}')
+            return {'encoding': encoding, 'operation': 'Subscribe ONCE', 'error': code}
+        finally:
+            self.close_subscription()
+        notifications = [response.update for response in responses
+                         if response.HasField('update')]
+        measurement = self._measure_notifications(notifications)
+        measurement.update(encoding=encoding, operation='Subscribe ONCE', ms=elapsed * 1000,
+                           bytes=sum(response.ByteSize() for response in responses))
+        return measurement
+
+    def _measure_get_encoding(self, path: str, encoding: str) -> t.Dict[str, t.Any]:
+        grpc = grpc_module()
+        iencoding = gnmi_common().encoding_str_to_int(encoding)
+        start = time.perf_counter()
+        try:
+            response = self._client.get_public(prefix=None, paths=[path], get_type=0,
+                                               encoding=iencoding)
+        except grpc.RpcError as err:
+            code = rpc_error_code(err)
+            trace(f'Get with encoding {encoding} failed: {err}')
+            return {'encoding': encoding, 'operation': 'Get', 'error': code}
+        elapsed = time.perf_counter() - start
+        measurement = self._measure_notifications(response.notification)
+        measurement.update(encoding=encoding, operation='Get', ms=elapsed * 1000,
+                           bytes=response.ByteSize())
+        return measurement
+
+    @staticmethod
+    def _measure_notifications(notifications: t.Sequence[gnmi.Notification]) \
+            -> t.Dict[str, t.Any]:
+        config = GNMIConfigTree()
+        start = time.perf_counter()
+        for notif in notifications:
+            apply_notification(config, notif)
+        decode_time = time.perf_counter() - start
+        return {'notifications': len(notifications),
+                'updates': sum(len(notif.update) for notif in notifications),
+                'decode_ms': decode_time * 1000}
+
+    def benchmark_subscription_churn(self, count: int, mode: str, encoding: str,
+                                     timeout: int) -> t.Dict[str, t.Any]:
+        '''Open and close `count` subscriptions to current subscription
+        paths in a tight loop and report latencies of the setup (until
+        the first response is received) and of the teardown.'''
+        setup: t.List[float] = []
+        teardown: t.List[float] = []
+        for index in range(count):
+            start = time.perf_counter()
+            self.subscribe(mode, encoding)
+            next(self.requester.responses(timeout, f'No response to subscription {index + 1}'))
+            opened = time.perf_counter()
+            self.close_subscription()
+            closed = time.perf_counter()
+            setup.append(opened - start)
+            teardown.append(closed - opened)
+        result = {'setup': percentiles(setup), 'teardown': percentiles(teardown)}
+        log_table(f'Subscription churn ({count} subscriptions)',
+                  ('phase', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms'),
+                  [(phase, *(f'{stats[name] * 1000:.1f}' for name in ('p50', 'p90', 'p99', 'max')))
+                   for phase, stats in result.items()])
+        return result
@@ -6,10 +6,11 @@ from enum import Enum
 import typing as t
 import json
 
-from confd_gnmi_common import add_path_prefix, make_formatted_path
-
-import gnmi_pb2 as gnmi
+from gnmi_modules import gnmi_common, gnmi_pb2
 
+if t.TYPE_CHECKING:
+    import gnmi_pb2 as gnmi
+    from sample_store import SampleStore
 
 UpIxT = t.TypeVar('UpIxT', bound='UpdateIndex')
 ConfT = t.TypeVar('ConfT', bound='GNMIConfig')
@@ -48,6 +49,8 @@ def assert_config(config: GNMIConfig, clazz: t.Type[ConfT]) -> ConfT:
 class GNMIConfig(ABC, t.Generic[UpIxT]):
     '''Configuration tree representation.'''
     type: t.Optional[str] = None
+    # number of nodes removed by deletes applied to this (root) configuration
+    deleted_nodes: int = 0
 
     @abstractmethod
     def update(self, UpIxT) -> UpdateType: ...
@@ -65,6 +68,22 @@ class GNMIConfig(ABC, t.Generic[UpIxT]):
         '''
         ...
 
+    @abstractmethod
+    def node_count(self) -> int:
+        '''Number of nodes of this configuration, including this one.'''
+        ...
+
+    def delete(self, elems: t.Sequence[gnmi.PathElem], index: int) -> int:
+        '''Delete all instances of the path `elems[index:]` below this node.
+
+        Nodes left empty by the deletion are pruned.  Return the number
+        of removed nodes.
+        '''
+        return 0
+
+    def is_empty(self) -> bool:
+        return False
+
 
 class UpdateIndex(ABC, t.Generic[UpIxT]):
     '''A pointer into a update data, either a path and value or a JSON tree.
@@ -114,6 +133,45 @@ class GNMIConfigTree(GNMIConfig[TreeIndexT]):
         return not self.tree.keys() - config.tree.keys() \
             and all(sub.covered_by(config.tree[elm]) for elm, sub in self.tree.items())
 
+    def node_count(self) -> int:
+        return 1 + sum(sub.node_count() for sub in self.tree.values())
+
+    def resolve_name(self, name: str) -> t.Optional[str]:
+        '''Name of the child element matching `name`, or None if there is none.
+
+        Names not found in the tree are also matched without their
+        module prefix and vice versa.'''
+        if name in self.tree:
+            return name
+        local_name = name.split(':')[-1]
+        return next((elname for elname in self.tree
+                     if elname.split(':')[-1] == local_name), None)
+
+    def delete(self, elems: t.Sequence[gnmi.PathElem], index: int) -> int:
+        if (name := self.resolve_name(elems[index].name)) is None:
+            return 0
+        child = self.tree[name]
+        if isinstance(child, GNMIConfigList):
+            # the list itself resolves the keys (if any)
+            removed = child.delete(elems, index)
+        elif elems[index].key:
+            # list instances not stored as a list (e.g. a JSON encoded value)
+            # cannot be told apart, keep the node rather than delete them all
+            return 0
+        elif index + 1 == len(elems):
+            removed = child.node_count()
+            del self.tree[name]
+            return removed
+        else:
+            removed = child.delete(elems, index + 1)
+        if child.is_empty():
+            del self.tree[name]
+            removed += 1
+        return removed
+
+    def is_empty(self) -> bool:
+        return not self.tree
+
 
 class GNMIConfigList(GNMIConfig['PathListIndex']):
     '''Representation of a list configuration.'''
@@ -122,6 +180,8 @@ class GNMIConfigList(GNMIConfig['PathListIndex']):
     def __init__(self, initial_keyset: t.Dict[str, str]) -> None:
         self.keys: t.Tuple[str, ...] = tuple(initial_keyset.keys())
         self.instances: t.Dict[t.Tuple[str, ...], GNMIConfig] = {}
+        # the highest number of instances since the dictionary has been (re)built
+        self._peak = 0
 
     def __repr__(self):
         pairs = ', '.join(f'{t} -> {v}' for t, v in self.instances.items())
@@ -136,6 +196,7 @@ class GNMIConfigList(GNMIConfig['PathListIndex']):
         else:
             child = subix.new_child()
             self.instances[keyvals] = child
+            self._peak = max(self._peak, len(self.instances))
             utype = UpdateType.STRUCTURE
         return child.update(subix) + utype
 
@@ -144,6 +205,37 @@ class GNMIConfigList(GNMIConfig['PathListIndex']):
         return not self.instances.keys() - config.instances.keys() \
             and all(sub.covered_by(config.instances[key]) for key, sub in self.instances.items())
 
+    def node_count(self) -> int:
+        return 1 + sum(sub.node_count() for sub in self.instances.values())
+
+    def delete(self, elems: t.Sequence[gnmi.PathElem], index: int) -> int:
+        pattern = tuple(v for _k, v in elems[index].key.items())
+        if not pattern or '*' in pattern:
+            # no keys or wildcards - all matching instances
+            matching = [keys for keys in self.instances
+                        if not pattern or all(p in ('*', k) for p, k in zip(pattern, keys))]
+        else:
+            matching = [pattern] if pattern in self.instances else []
+        removed = 0
+        for keys in matching:
+            instance = self.instances[keys]
+            if index + 1 == len(elems):
+                removed += instance.node_count()
+                del self.instances[keys]
+            else:
+                removed += instance.delete(elems, index + 1)
+                if instance.is_empty():
+                    del self.instances[keys]
+                    removed += 1
+        if len(self.instances) * 4 < self._peak:
+            # dictionaries do not shrink on deletion, rebuild to release the memory
+            self.instances = dict(self.instances)
+            self._peak = len(self.instances)
+        return removed
+
+    def is_empty(self) -> bool:
+        return not self.instances
+
 
 ValueIndexT = t.Union['JsonValueIndex', 'PlainValueIndex']
 
@@ -153,7 +245,7 @@ class GNMIConfigValue(GNMIConfig[ValueIndexT]):
     type = 'value'
 
     def __init__(self) -> None:
-        self.value: gnmi.TypedValue = gnmi.TypedValue()
+        self.value: gnmi.TypedValue = gnmi_pb2().TypedValue()
 
     def __repr__(self):
         return repr(self.value)
@@ -168,6 +260,9 @@ class GNMIConfigValue(GNMIConfig[ValueIndexT]):
         assert_config(other, GNMIConfigValue)
         return True
 
+    def node_count(self) -> int:
+        return 1
+
 
 class PathIndex(UpdateIndex[UpIxT]):
     '''Pointer into a gNMI path with the value'''
@@ -276,11 +371,31 @@ class JsonTreeIndex(UpdateIndex['JsonTreeIndex']):
         return GNMIConfigTree()
 
 
+def lookup_config(config: GNMIConfig, elems: t.Sequence[gnmi.PathElem]) \
+        -> t.Optional[GNMIConfig]:
+    '''Find the configuration node at given path, or None if there is none.
+
+    Path element names are resolved by `GNMIConfigTree.resolve_name`.'''
+    for elem in elems:
+        if not isinstance(config, GNMIConfigTree):
+            return None
+        if (name := config.resolve_name(elem.name)) is None:
+            return None
+        config = config.tree[name]
+        if elem.key:
+            if not isinstance(config, GNMIConfigList):
+                return None
+            keyvals = tuple(v for _k, v in elem.key.items())
+            if (config := config.instances.get(keyvals)) is None:
+                return None
+    return config
+
+
 def apply_update(config: GNMIConfig, path: gnmi.Path, update: gnmi.Update,
                  minimal_update: UpdateType) -> None:
     '''Apply a gNMI Update instance and verify that satisfies the minimal update requirement.'''
     if not minimal_update <= config.update(PathTreeIndex(path.elem, 0, update.val)):
-        up_str = f'{make_formatted_path(path)} = {update.val}'
+        up_str = f'{gnmi_common().make_formatted_path(path)} = {update.val}'
         if minimal_update == UpdateType.STRUCTURE:
             msg = f'expected structural update, received: {up_str}'
         else:
@@ -288,14 +403,47 @@ def apply_update(config: GNMIConfig, path: gnmi.Path, update: gnmi.Update,
         raise AssertionError(msg)
 
 
+def apply_delete(config: GNMIConfig, path: gnmi.Path) -> int:
+    '''Delete the subtree at the path, or the whole content for an empty path.
+
+    Return the number of removed nodes, these are also added to the
+    `deleted_nodes` counter of the configuration.'''
+    if path.elem:
+        removed = config.delete(path.elem, 0)
+    else:
+        removed = config.node_count() - 1
+        config.tree.clear()
+    config.deleted_nodes += removed
+    return removed
+
+
 def apply_response(config: GNMIConfig, response: gnmi.SubscribeResponse,
-                   minimal_update: UpdateType = UpdateType.NONE) -> bool:
+                   minimal_update: UpdateType = UpdateType.NONE,
+                   samples: t.Optional[SampleStore] = None) -> bool:
     '''Apply a full gNMI SubscribeResponse instance verifying the
     individual updates satisfy minimal update requirements.'''
-    notif = response.update
+    return apply_notification(config, response.update, minimal_update, samples)
+
+
+def apply_notification(config: GNMIConfig, notif: gnmi.Notification,
+                       minimal_update: UpdateType = UpdateType.NONE,
+                       samples: t.Optional[SampleStore] = None) -> bool:
+    '''Apply a gNMI Notification instance (as found in SubscribeResponse
+    or GetResponse) verifying the individual updates satisfy minimal
+    update requirements.
+
+    If `samples` is provided, numeric leaf values are recorded there too.
+    Deletes are applied before updates, as required by the
+    specification.  Return True if there was any update or delete.'''
+    common = gnmi_common()
     have_updates = False
+    for delete in notif.delete:
+        have_updates = True
+        apply_delete(config, common.add_path_prefix(delete, notif.prefix))
     for update in notif.update:
         have_updates = True
-        path = add_path_prefix(update.path, notif.prefix)
+        path = common.add_path_prefix(update.path, notif.prefix)
         apply_update(config, path, update, minimal_update)
+        if samples is not None:
+            samples.record_update(common.make_formatted_path(path), notif.timestamp, update.val)
     return have_updates
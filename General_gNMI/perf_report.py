@@ -0,0 +1,64 @@
+"""Helpers for collecting and reporting performance measurements."""
+from __future__ import annotations
+
+import csv
+import gzip
+import json
+import math
+import typing as t
+import zlib
+
+from robot.api.logger import info
+
+
+def compressed_size(data: bytes, compression: t.Optional[str]) -> int:
+    '''Estimate number of bytes a gRPC message payload takes on the wire
+    with given message compression algorithm.'''
+    if compression == 'gzip':
+        return len(gzip.compress(data))
+    if compression == 'deflate':
+        return len(zlib.compress(data))
+    return len(data)
+
+
+def percentiles(samples: t.Iterable[float], pcts: t.Sequence[float] = (50, 90, 99)) \
+        -> t.Dict[str, float]:
+    '''Nearest-rank percentiles of the samples, plus their maximum;
+    empty dictionary if there are no samples.'''
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+    result = {f'p{pct:g}': ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+              for pct in pcts}
+    result['max'] = ordered[-1]
+    return result
+
+
+def format_table(headers: t.Sequence[str], rows: t.Iterable[t.Sequence[t.Any]]) -> str:
+    '''Format rows as a plain text table with aligned columns.'''
+    lines = [[str(h) for h in headers]] + [[str(c) for c in row] for row in rows]
+    widths = [max(len(line[i]) for line in lines) for i in range(len(headers))]
+    formatted = ['  '.join(cell.rjust(width) for cell, width in zip(line, widths))
+                 for line in lines]
+    formatted.insert(1, '  '.join('-' * width for width in widths))
+    return '\n'.join(formatted)
+
+
+def log_table(title: str, headers: t.Sequence[str], rows: t.Iterable[t.Sequence[t.Any]]) -> None:
+    '''Log a table into the Robot log (and the console).'''
+    info(f'{title}\n{format_table(headers, rows)}', also_console=True)
+
+
+def write_report(path: str, rows: t.Sequence[t.Dict[str, t.Any]]) -> None:
+    '''Write report rows into a JSON file, or into a CSV file if the file
+    name ends with ".csv" (nested values are JSON encoded then).'''
+    with open(path, 'w', newline='') as report:
+        if not path.lower().endswith('.csv'):
+            json.dump(list(rows), report, indent=2)
+            return
+        fieldnames = list(dict.fromkeys(name for row in rows for name in row))
+        writer = csv.DictWriter(report, fieldnames)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({name: json.dumps(value) if isinstance(value, (dict, list)) else value
+                             for name, value in row.items()})
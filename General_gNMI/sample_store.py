@@ -0,0 +1,119 @@
+"""Columnar store of numeric leaf values received in subscription updates."""
+from __future__ import annotations
+
+from array import array
+from fnmatch import fnmatchcase
+import json
+import operator
+import re
+import typing as t
+
+if t.TYPE_CHECKING:
+    import gnmi_pb2 as gnmi
+
+
+NUMERIC_FIELDS = {'uint_val': 'Q', 'int_val': 'q', 'double_val': 'd', 'float_val': 'd'}
+JSON_FIELDS = ('json_val', 'json_ietf_val')
+NS_PER_SECOND = 1_000_000_000
+INTEGER_STRING = re.compile(r'-?[0-9]+')
+
+
+class LeafSeries:
+    '''Timestamps and values of a single leaf, stored in compact arrays.
+
+    The value array type follows the first recorded value (unsigned,
+    signed or floating point) and is widened to signed or floating
+    point if a later value does not fit.
+    '''
+    __slots__ = ('timestamps', 'values')
+
+    def __init__(self, typecode: str) -> None:
+        self.timestamps = array('q')
+        self.values = array(typecode)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def append(self, timestamp: int, value: t.Union[int, float]) -> None:
+        try:
+            self.values.append(value)
+        except (OverflowError, TypeError):
+            try:
+                self.values = array('q', self.values)
+                self.values.append(value)
+            except (OverflowError, TypeError):
+                self.values = array('d', self.values)
+                self.values.append(value)
+        self.timestamps.append(timestamp)
+
+    def decreases(self) -> bool:
+        values = self.values
+        return any(map(operator.gt, values, values[1:]))
+
+    def rates(self) -> t.Iterator[float]:
+        '''Per-second rates between consecutive samples.'''
+        values, timestamps = self.values, self.timestamps
+        for dvalue, dtime in zip(map(operator.sub, values[1:], values),
+                                 map(operator.sub, timestamps[1:], timestamps)):
+            if dtime > 0:
+                yield dvalue * NS_PER_SECOND / dtime
+
+    def stale(self, count: int) -> bool:
+        '''Whether the last `count` samples all have the same value.'''
+        values = self.values
+        return len(values) >= count and values[-count:].count(values[-1]) == count
+
+
+class SampleStore:
+    '''History of numeric leaf values, indexed by formatted leaf paths.'''
+    def __init__(self) -> None:
+        self.series: t.Dict[str, LeafSeries] = {}
+        # string leaves seen with non-integer values, never recorded
+        self.non_numeric: t.Set[str] = set()
+
+    def record(self, path: str, timestamp: int, value: t.Union[int, float]) -> None:
+        if (series := self.series.get(path)) is None:
+            if isinstance(value, float):
+                typecode = 'd'
+            else:
+                typecode = 'Q' if value >= 0 else 'q'
+            series = self.series[path] = LeafSeries(typecode)
+        series.append(timestamp, value)
+
+    def record_update(self, path: str, timestamp: int, value: gnmi.TypedValue) -> None:
+        '''Record numeric leaves found in an update value - either a numeric
+        scalar or integers in a JSON encoded value.'''
+        field = value.WhichOneof('value')
+        if field in NUMERIC_FIELDS:
+            self.record(path, timestamp, getattr(value, field))
+        elif field in JSON_FIELDS:
+            self._record_json(path, timestamp, json.loads(getattr(value, field)))
+
+    def _record_json(self, path: str, timestamp: int, value: t.Any) -> None:
+        if isinstance(value, bool):
+            return
+        if isinstance(value, (int, float)):
+            self.record(path, timestamp, value)
+        elif isinstance(value, str):
+            # RFC 7951 encodes 64-bit integers as strings; a string leaf
+            # merely looking like a number at times is dropped
+            if path in self.non_numeric:
+                return
+            if INTEGER_STRING.fullmatch(value):
+                self.record(path, timestamp, int(value))
+            else:
+                self.series.pop(path, None)
+                self.non_numeric.add(path)
+        elif isinstance(value, dict):
+            for name, subvalue in value.items():
+                self._record_json(f'{path}/{name}', timestamp, subvalue)
+        # list instances inside of JSON values have no path to be recorded under
+
+    def matching(self, pattern: str) -> t.Iterator[t.Tuple[str, LeafSeries]]:
+        '''Iterate over series with paths matching the glob pattern.'''
+        return ((path, series) for path, series in self.series.items()
+                if fnmatchcase(path, pattern))
+
+    def clear(self) -> None:
+        self.series.clear()
+        self.non_numeric.clear()
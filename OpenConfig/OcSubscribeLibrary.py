@@ -28,16 +28,27 @@ class OcSubscribeLibrary(SubscribeLibrary):
         be "VALUE" updates only.
         '''
         config = GNMIConfigTree()
-        expected = PathTree(self._expected_paths)
         for response in self._iterate_initial_responses(timeout):
-            apply_response(config, response, UpdateType.STRUCTURE)
+            apply_response(config, response, UpdateType.STRUCTURE, self.samples)
+        self._check_expected_coverage(config)
+        self._wait_on_change_updates(config, timeout, update_time)
+
+    def check_expected_paths_in_snapshot(self, mode: str, encoding: str, timeout: int) -> None:
+        '''Verify that the initial subscription snapshot covers all expected paths.
+
+        Unlike `check_expected_paths`, this does not need its own
+        subscription - the snapshot may be served from the snapshot cache.
+        '''
+        self._check_expected_coverage(self.initial_snapshot(mode, encoding, timeout))
+
+    def _check_expected_coverage(self, config: GNMIConfigTree) -> None:
+        expected = PathTree(self._expected_paths)
         expected.check_covered_by(config)
         if expected.omissions:
             elems = ', '.join(list(expected.omissions)[:MAX_REPORTED_OMISSIONS])
             if len(expected.omissions) > MAX_REPORTED_OMISSIONS:
                 elems += f', ... (in total {len(expected.omissions)} elements missing)'
             raise AssertionError(f'Elements not covered by initial updates: {elems}')
-        self._wait_on_change_updates(config, timeout, update_time)
 
 
 class PathTree:
@@ -0,0 +1,89 @@
+"""Limit the number of concurrent gNMI sessions/streams per device across test processes.
+
+Each device has a directory with one lock file per allowed session (or
+stream); holding an exclusive lock on one of the files means holding a
+slot.  Locks are released by the operating system when a process ends,
+so a crashed test run never keeps slots occupied.
+"""
+from __future__ import annotations
+
+import os
+import re
+import tempfile
+import time
+import typing as t
+
+from robot.api.logger import info, trace, warn
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+DEFAULT_TIMEOUT = 300
+POLL_INTERVAL = 0.1
+
+
+class SlotLock:
+    """ An occupied slot, to be released when the session/stream is closed. """
+    def __init__(self, lockfile: t.IO) -> None:
+        self._lockfile = lockfile
+
+    def release(self) -> None:
+        if not self._lockfile.closed:
+            fcntl.flock(self._lockfile, fcntl.LOCK_UN)
+            self._lockfile.close()
+
+
+class DeviceSlots:
+    """ Slots of one kind (e.g. sessions) of a device.\n
+        The limit and the other settings are taken from ``device_config``:
+        ``max_<kind>s`` (at least 1, no limit if not set), ``limiter_timeout`` (seconds)
+        and ``limiter_dir`` (defaults to a directory in the system temp directory). """
+    def __init__(self, device_config, kind: str) -> None:
+        self.kind = kind
+        self.device = f'{device_config.host}:{device_config.port}'
+        limit = device_config.get(f'max_{kind}s')
+        self.limit: t.Optional[int] = int(limit) if limit is not None else None
+        if self.limit is not None and self.limit < 1:
+            raise ValueError(f'max_{kind}s needs to be at least 1 (got {limit}), '
+                             f'leave it unset for no limit')
+        self.timeout = float(device_config.get('limiter_timeout') or DEFAULT_TIMEOUT)
+        lock_dir = device_config.get('limiter_dir') \
+            or os.path.join(tempfile.gettempdir(), 'gnmi-tests-limiter')
+        self.directory = os.path.join(lock_dir, re.sub(r'[^\w.-]+', '_', self.device))
+
+    def acquire(self) -> t.Optional[SlotLock]:
+        """ Wait for a free slot and occupy it; return None if there is no limit. """
+        if self.limit is None:
+            return None
+        if fcntl is None:
+            warn(f'Concurrent {self.kind}s limit is not supported on this platform')
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        start = time.monotonic()
+        while True:
+            if (slot := self._try_acquire()) is not None:
+                break
+            if time.monotonic() - start > self.timeout:
+                raise AssertionError(f'No free {self.kind} slot (out of {self.limit}) '
+                                     f'for {self.device} within {self.timeout} seconds')
+            time.sleep(POLL_INTERVAL)
+        waited = time.monotonic() - start
+        message = f'Waited {waited:.2f} s for a free {self.kind} slot for {self.device}'
+        if waited >= POLL_INTERVAL:
+            info(message)
+        else:
+            trace(message)
+        return slot
+
+    def _try_acquire(self) -> t.Optional[SlotLock]:
+        for index in range(self.limit):
+            lockfile = open(os.path.join(self.directory, f'{self.kind}-{index}.lock'), 'a')
+            try:
+                fcntl.flock(lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lockfile.close()
+                continue
+            return SlotLock(lockfile)
+        return None
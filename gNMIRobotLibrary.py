@@ -1,8 +1,223 @@
+from __future__ import annotations
 from abc import ABC
+from contextlib import contextmanager
+import cProfile
+import inspect
+import io
 import logging
-from typing import Dict, Optional
-from robot.api.logger import trace
-from confd_gnmi_client import ConfDgNMIClient
+import os
+import pstats
+import re
+import sys
+import threading
+import tracemalloc
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+import robot
+from robot.api.logger import info, trace
+from robot.libraries.BuiltIn import BuiltIn
+from device_limiter import DeviceSlots, SlotLock
+from gnmi_modules import gnmi_client_class, grpc_module
+
+# gRPC/protobuf stack is imported only when actually needed,
+# to keep library loading (dry-run, testdoc) fast
+if TYPE_CHECKING:
+    from confd_gnmi_client import ConfDgNMIClient
+    import grpc
+
+
+COMPRESSION_ALGORITHMS = {
+    'none': 'NoCompression',
+    'gzip': 'Gzip',
+    'deflate': 'Deflate',
+}
+
+
+def channel_settings(device_config) -> Tuple[List[Tuple[str, Any]], Optional[grpc.Compression]]:
+    """ Translate the optional channel tuning items of ``device_config``
+        into gRPC channel options and channel compression. """
+    options = []
+    max_message_size = device_config.get('max_message_size')
+    if max_message_size is not None:
+        options.append(('grpc.max_receive_message_length', int(max_message_size)))
+        options.append(('grpc.max_send_message_length', int(max_message_size)))
+    keepalive_time_ms = device_config.get('keepalive_time_ms')
+    if keepalive_time_ms is not None:
+        options.append(('grpc.keepalive_time_ms', int(keepalive_time_ms)))
+    keepalive_timeout_ms = device_config.get('keepalive_timeout_ms')
+    if keepalive_timeout_ms is not None:
+        options.append(('grpc.keepalive_timeout_ms', int(keepalive_timeout_ms)))
+    compression = device_config.get('compression')
+    if compression is None:
+        return options, None
+    try:
+        algorithm = COMPRESSION_ALGORITHMS[str(compression).lower()]
+    except KeyError:
+        raise ValueError(f'Unsupported channel compression "{compression}", '
+                         f'use one of: {", ".join(COMPRESSION_ALGORITHMS)}') from None
+    return options, getattr(grpc_module().Compression, algorithm)
+
+
+@contextmanager
+def tuned_channels(options: List[Tuple[str, Any]], compression: Optional[grpc.Compression]) \
+        -> Iterator[None]:
+    """ Make gRPC channels created by the current thread within the context use given
+        options and compression.\n
+        ``ConfDgNMIClient`` creates its channel internally, without a way to pass these.
+        Channels created by other threads meanwhile are not affected. If no channel
+        was created through ``grpc.insecure_channel``/``grpc.secure_channel`` within
+        the context, ``RuntimeError`` is raised - the tuning would be lost silently otherwise. """
+    if not options and compression is None:
+        yield
+        return
+    grpc = grpc_module()
+    factories = {'insecure_channel': grpc.insecure_channel,
+                 'secure_channel': grpc.secure_channel}
+    owner = threading.get_ident()
+    tuned_count = 0
+
+    def tuned(factory):
+        def make_channel(*args, **kwargs):
+            nonlocal tuned_count
+            if threading.get_ident() != owner:
+                return factory(*args, **kwargs)
+            call = inspect.signature(factory).bind(*args, **kwargs)
+            call.arguments['options'] = list(call.arguments.get('options') or ()) + options
+            if compression is not None:
+                call.arguments['compression'] = compression
+            tuned_count += 1
+            return factory(*call.args, **call.kwargs)
+        return make_channel
+
+    for name, factory in factories.items():
+        setattr(grpc, name, tuned(factory))
+    try:
+        yield
+    finally:
+        for name, factory in factories.items():
+            setattr(grpc, name, factory)
+    if tuned_count == 0:
+        raise RuntimeError('Channel options/compression could not be applied, '
+                           'the gNMI client did not create its channel by grpc.insecure_channel '
+                           'or grpc.secure_channel')
+
+
+class KeywordProfiler:
+    """ Robot listener profiling keywords of a single library.\n
+        When enabled, calls of the library's keywords in each test are profiled
+        by ``cProfile``, together with threads started during the test (e.g. the
+        subscription response threads), and memory allocations during the test
+        are traced by ``tracemalloc``. At the end of the test, the statistics are
+        written next to ``output.xml`` and a summary goes to the Robot log. """
+    ROBOT_LISTENER_API_VERSION = 2
+    TOP_ENTRIES = 15
+
+    def __init__(self, library_name: str, enabled: bool) -> None:
+        self.library_name = library_name
+        self.enabled = enabled
+        self._profile: Optional[cProfile.Profile] = None
+        self._thread_profiles: List[Tuple[threading.Thread, cProfile.Profile]] = []
+        self._depth = 0
+        self._own_tracemalloc = False
+        self._start_snapshot: Optional[tracemalloc.Snapshot] = None
+
+    def start(self) -> None:
+        if self._profile is not None:
+            # already profiling this test, keep its data and the tracemalloc ownership
+            return
+        self._profile = cProfile.Profile()
+        self._thread_profiles = []
+        self._depth = 0
+        threading.setprofile(self._profile_thread)
+        self._own_tracemalloc = not tracemalloc.is_tracing()
+        if self._own_tracemalloc:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+            tracemalloc.reset_peak()
+        self._start_snapshot = tracemalloc.take_snapshot()
+
+    def stop(self) -> None:
+        if self._profile is not None:
+            threading.setprofile(None)
+            self._profile.disable()
+            self._profile = None
+            if self._own_tracemalloc:
+                tracemalloc.stop()
+                self._own_tracemalloc = False
+
+    def _profile_thread(self, frame, event, arg) -> None:
+        # runs in each newly started thread and replaces itself by the thread's own profiler
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler, the main one covers all threads then
+            return
+        self._thread_profiles.append((threading.current_thread(), profile))
+
+    def _collect_stats(self, profile: cProfile.Profile, stream: io.StringIO) -> pstats.Stats:
+        """ Merge the main profile with profiles of threads that have finished.
+            Profiles without any calls are skipped, ``pstats`` refuses them. """
+        stats = pstats.Stats(stream=stream)
+        if profile.getstats():
+            stats.add(profile)
+        running = 0
+        for thread, thread_profile in self._thread_profiles:
+            if thread.is_alive():
+                running += 1
+                continue
+            thread_profile.disable()
+            if thread_profile.getstats():
+                stats.add(thread_profile)
+        if running:
+            stream.write(f'{running} threads still running, not included\n')
+        self._thread_profiles = []
+        return stats
+
+    def start_test(self, name: str, attrs: Dict[str, Any]) -> None:
+        if self.enabled:
+            self.start()
+
+    def start_keyword(self, name: str, attrs: Dict[str, Any]) -> None:
+        if self._profile is not None and attrs.get('libname') == self.library_name:
+            if self._depth == 0:
+                self._profile.enable()
+            self._depth += 1
+
+    def end_keyword(self, name: str, attrs: Dict[str, Any]) -> None:
+        if self._profile is not None and attrs.get('libname') == self.library_name \
+                and self._depth > 0:
+            self._depth -= 1
+            if self._depth == 0:
+                self._profile.disable()
+
+    def end_test(self, name: str, attrs: Dict[str, Any]) -> None:
+        if self._profile is None:
+            return
+        profile = self._profile
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),
+             tracemalloc.Filter(False, os.path.join(os.path.dirname(robot.__file__), '*'))))
+        _current, peak = tracemalloc.get_traced_memory()
+        self.stop()
+        output_dir = BuiltIn().get_variable_value('${OUTPUT DIR}', '.')
+        test_name = re.sub(r'\W+', '_', name)
+        base = os.path.join(output_dir, f"profile-{attrs['id']}-{test_name}")
+        stream = io.StringIO()
+        stats = self._collect_stats(profile, stream)
+        allocations = snapshot.compare_to(self._start_snapshot, 'lineno')[:self.TOP_ENTRIES]
+        with open(base + '-tracemalloc.txt', 'w') as tracefile:
+            tracefile.write(f'peak traced memory: {peak} B\n')
+            tracefile.writelines(f'{stat}\n' for stat in allocations)
+        if stats.stats:
+            stats.dump_stats(base + '.prof')
+            stats.sort_stats('cumulative').print_stats(self.TOP_ENTRIES)
+            summary = f'Profile of {self.library_name} keywords written to {base}.prof\n'
+        else:
+            summary = f'No {self.library_name} keywords profiled\n'
+        info(f'{summary}{stream.getvalue()}\n'
+             f'Peak traced memory: {peak / 1024:.0f} kB, top allocations (not freed):\n'
+             + '\n'.join(str(stat) for stat in allocations[:5]))
 
 
 class gNMIRobotLibrary(ABC):
@@ -13,7 +228,25 @@ class gNMIRobotLibrary(ABC):
     """ Common gNMI related functionality used across Robot tests and all libraries inheriting. """
     def __init__(self, lib_config) -> None:
         self._client: Optional[ConfDgNMIClient] = None
-        if not lib_config.enable_extra_logs:
+        self._enable_extra_logs = lib_config.enable_extra_logs
+        self._profiler = KeywordProfiler(type(self).__name__, bool(lib_config.get('profiling')))
+        self.ROBOT_LIBRARY_LISTENER = self._profiler
+        self._session_slot: Optional[SlotLock] = None
+        self._stream_slots: Optional[DeviceSlots] = None
+
+    def enable_profiling(self) -> None:
+        """ Profile calls of this library's keywords, from now on till the end of the suite.\n
+            Can be enabled for all tests by ``profiling`` item of ``lib_config``. """
+        self._profiler.enabled = True
+        self._profiler.start()
+
+    def disable_profiling(self) -> None:
+        """ Stop profiling of the library's keywords (data of the current test are discarded). """
+        self._profiler.enabled = False
+        self._profiler.stop()
+
+    def _silence_client_loggers(self) -> None:
+        if not self._enable_extra_logs:
             # disable all confg_gnmi_ loggers to not pollute robot logs
             for name in logging.root.manager.loggerDict:
                 if name.startswith('confd_gnmi_'):
@@ -22,19 +255,55 @@ class gNMIRobotLibrary(ABC):
             logging.getLogger('confd_gnmi_rpc').disabled = False
 
     def setup_client(self, device_config):
-        """ Initialize new gNMI client instance for dispatching the requests to server. """
-        self._client = ConfDgNMIClient(host=device_config.host,
-                                       port=device_config.port,
-                                       insecure=device_config.insecure,
-                                       username=device_config.username,
-                                       password=device_config.password)
-        trace('gNMI client connection OK')
+        """ Initialize new gNMI client instance for dispatching the requests to server.\n
+            Optional ``device_config`` items ``compression`` (none/gzip/deflate),
+            ``max_message_size`` (bytes), ``keepalive_time_ms`` and ``keepalive_timeout_ms``
+            tune the client's gRPC channel.\n
+            If ``device_config`` has ``max_sessions``/``max_streams`` items, the number
+            of concurrent sessions/streams to the device is limited across all test
+            processes on this machine (e.g. parallel suite runners); the setup waits
+            for a free session slot then. """
+        ConfDgNMIClient = gnmi_client_class()
+        self._silence_client_loggers()
+        options, compression = channel_settings(device_config)
+        # both limits are validated before a session slot is held
+        session_slots = DeviceSlots(device_config, 'session')
+        self._stream_slots = DeviceSlots(device_config, 'stream')
+        if self._session_slot is None:
+            self._session_slot = session_slots.acquire()
+        client = None
+        try:
+            with tuned_channels(options, compression):
+                client = ConfDgNMIClient(host=device_config.host,
+                                         port=device_config.port,
+                                         insecure=device_config.insecure,
+                                         username=device_config.username,
+                                         password=device_config.password)
+        except Exception:
+            if client is not None:
+                client.close()
+            self._release_session_slot()
+            raise
+        self._client = client
+        trace(f'gNMI client connection OK (options: {options}, compression: {compression})')
 
     def close_client(self):
-        """ Close previously initialized gNMI client instance. """
-        self._client.close()
+        """ Close previously initialized gNMI client instance, if any
+            (the test setup may have been skipped or failed). """
+        if self._client is None:
+            self._release_session_slot()
+            return
+        try:
+            self._client.close()
+        finally:
+            self._release_session_slot()
         trace('gNMI client connection closed')
 
+    def _release_session_slot(self) -> None:
+        if self._session_slot is not None:
+            self._session_slot.release()
+            self._session_slot = None
+
     def _assert_condition(self, condition: bool, message: str):
         if not condition:
             trace(f'last response:\n{self.last_response}')
@@ -0,0 +1,48 @@
+"""Lazy access to the gRPC/protobuf stack and to the gNMI client modules.
+
+The modules are imported only when actually needed, to keep library
+loading (dry-run, testdoc) fast.  The accessors are cached, so calling
+them even in hot paths costs just a cache lookup.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from types import ModuleType
+import typing as t
+
+if t.TYPE_CHECKING:
+    from confd_gnmi_client import ConfDgNMIClient
+
+
+@lru_cache(maxsize=None)
+def grpc_module() -> ModuleType:
+    """ The ``grpc`` module. """
+    import grpc
+    return grpc
+
+
+@lru_cache(maxsize=None)
+def gnmi_pb2() -> ModuleType:
+    """ The ``gnmi_pb2`` module (gNMI protobuf messages). """
+    import gnmi_pb2
+    return gnmi_pb2
+
+
+@lru_cache(maxsize=None)
+def gnmi_common() -> ModuleType:
+    """ The ``confd_gnmi_common`` module (path and enum conversions). """
+    import confd_gnmi_common
+    return confd_gnmi_common
+
+
+@lru_cache(maxsize=None)
+def gnmi_client_class() -> t.Type[ConfDgNMIClient]:
+    """ The ``ConfDgNMIClient`` class. """
+    from confd_gnmi_client import ConfDgNMIClient
+    return ConfDgNMIClient
+
+
+def rpc_error_code(err: Exception) -> str:
+    """ Name of the status code of a failed gRPC call, ``UNKNOWN`` if there is none. """
+    grpc = grpc_module()
+    return err.code().name if isinstance(err, grpc.Call) else 'UNKNOWN'
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Measure start-up time of the test libraries and of a ``robot --dryrun`` over the test suites.
+
+Each measurement runs in a fresh interpreter, so that nothing is cached
+between the runs.  Run from the directory with this file, e.g.:
+
+    python startup_benchmark.py --variablefile adapter.yaml \\
+        --variablefile interfaces.yaml --variablefile defaults.yaml
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import typing as t
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'General_gNMI'))
+
+from perf_report import format_table  # noqa: E402
+
+LIBRARIES = ['gNMIRobotLibrary', 'CapabilitiesLibrary', 'GetLibrary',
+             'SubscribeLibrary', 'OcSubscribeLibrary']
+
+
+def environment() -> t.Dict[str, str]:
+    env = dict(os.environ)
+    paths = [ROOT, os.path.join(ROOT, 'General_gNMI'), os.path.join(ROOT, 'OpenConfig')]
+    if env.get('PYTHONPATH'):
+        paths.append(env['PYTHONPATH'])
+    env['PYTHONPATH'] = os.pathsep.join(paths)
+    return env
+
+
+def measure(command: t.List[str], repeat: int) -> t.Tuple[float, float, int]:
+    '''Run the command `repeat` times, return min and median time in
+    milliseconds and the last return code.'''
+    env = environment()
+    times = []
+    returncode = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        returncode = subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.DEVNULL).returncode
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times), statistics.median(times), returncode
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help='number of runs of each measurement')
+    parser.add_argument('--variablefile', action='append', default=[],
+                        help='variable file passed to the robot dry-run')
+    parser.add_argument('--no-dryrun', action='store_true', help='measure library imports only')
+    args = parser.parse_args()
+
+    rows = [('python (baseline)',) + measure([sys.executable, '-c', 'pass'], args.repeat)]
+    for library in LIBRARIES:
+        command = [sys.executable, '-c', f'import {library}']
+        rows.append((f'import {library}',) + measure(command, args.repeat))
+    if not args.no_dryrun:
+        command = [sys.executable, '-m', 'robot', '--dryrun', '--output', 'NONE',
+                   '--report', 'NONE', '--log', 'NONE']
+        for variablefile in args.variablefile:
+            command += ['--variablefile', variablefile]
+        rows.append(('robot --dryrun',) + measure(command + ['.'], args.repeat))
+    print(format_table(('measurement', 'min ms', 'median ms', 'exit code'),
+                       [(name, f'{low:.0f}', f'{median:.0f}', code)
+                        for name, low, median, code in rows]))
+    return max(row[3] for row in rows)
+
+
+if __name__ == '__main__':
+    sys.exit(main())